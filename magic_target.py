@@ -20,38 +20,83 @@ Usage:
 import os
 import re
 import time
+import functools
 import argparse
+import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse, urljoin, quote_plus
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
 import pandas as pd
 
+try:
+    import requests_cache
+except ImportError:  # cache HTTP sur disque optionnel
+    requests_cache = None
+
+try:
+    import orjson
+except ImportError:  # décodeur JSON rapide optionnel (réponses SerpAPI)
+    orjson = None
+
 # ---- Config ----
 UA = "Mozilla/5.0 (compatible; OutboundScorer/0.1)"
 HDR = {"User-Agent": UA}
 NOW = datetime(2025, 10, 15, tzinfo=timezone.utc)
 
-RX_SF = re.compile(r"\b(salesforce|sfdc|sales cloud|service cloud|marketing cloud|salesforce\.com)\b", re.IGNORECASE)
-RX_LK = re.compile(r"\b(looker|lookml|looker studio|looker blocks?)\b", re.IGNORECASE)
-RX_FPNA = re.compile(r"\b(fp&a|fpna|financial planning)\b", re.IGNORECASE)
+RX_SF = re.compile(r"\b(?:salesforce|sfdc|sales cloud|service cloud|marketing cloud|salesforce\.com)\b", re.IGNORECASE)
+RX_LK = re.compile(r"\b(?:looker|lookml|looker studio|looker blocks?)\b", re.IGNORECASE)
+RX_FPNA = re.compile(r"\b(?:fp&a|fpna|financial planning)\b", re.IGNORECASE)
+RX_BUCKETS = {"sf": RX_SF, "lk": RX_LK, "fpna": RX_FPNA}
 
 CAREERS_HINTS = ("career", "careers", "job", "jobs", "join", "vacancy", "opportunities")
 CAREERS_FALLBACK = ("/careers", "/jobs", "/career", "/join-us")
 SERIES_GROWTH = {"series b", "series c", "series d", "growth equity", "private equity"}
+YES = {"yes","y","true","t","1","actively hiring","hiring"}
+_RX_NUM = re.compile(r"(\d+(\.\d+)?)\s*([KMB])?")
+_RX_RANGE = re.compile(r"^\$?([\d\.]+)\s*([KMB])\s*[-–]\s*\$?([\d\.]+)\s*([KMB])$")
+_RX_SINGLE = re.compile(r"^\$?([\d\.]+)\s*([KMB])\+?$")
+_RX_ANY = re.compile(r"([\d\.]+)\s*([KMB])")
+_RX_EMP_RANGE = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*$")
+_RX_EMP_DIGITS = re.compile(r"\D")
+FINAL_COLS = (("Score","score"), ("Size_OK","size_ok"), ("Growth_OK","growth_ok"), ("FPnA_OK","fpna_ok"),
+              ("Jobs_OK","jobs_ok"), ("Stack_OK","stack_ok"), ("Mid_OK","mid_ok"), ("MonthsSinceRaise","months_since_raise"))
+DATE_FMTS = ("%Y-%m-%d","%Y/%m/%d","%d/%m/%Y","%m/%d/%Y","%b %d, %Y","%B %d, %Y","%Y-%m")
 
 LOGGER = logging.getLogger("top240")
 
+# Session partagée: keep-alive + pool de connexions (évite un handshake TLS par requête),
+# avec cache disque des GET si requests-cache est installé (évite la requête elle-même).
+# Le paramètre api_key de SerpAPI est ignoré par défaut dans la clé de cache (et masqué dans
+# l'URL stockée): les résultats SerpAPI en cache sont partagés entre clés.
+def build_session(cache_path=None):
+    if cache_path and requests_cache is not None:
+        session = requests_cache.CachedSession(str(cache_path), expire_after=timedelta(days=7),
+                                               allowable_methods=("GET",))
+    else:
+        session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64,
+                          max_retries=Retry(total=2, backoff_factor=0.3, respect_retry_after_header=False))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HDR)
+    return session
+
+SESSION = build_session()
+
 # ---- Parsers ----
+@functools.lru_cache(maxsize=4096)
 def months_since(date_str: str):
     if not isinstance(date_str, str) or not date_str.strip():
         return None
     s = date_str.strip()
-    fmts = ["%Y-%m-%d","%Y/%m/%d","%d/%m/%Y","%m/%d/%Y","%b %d, %Y","%B %d, %Y","%Y-%m"]
-    for f in fmts:
+    for f in DATE_FMTS:
         try:
             dt = datetime.strptime(s, f).replace(tzinfo=timezone.utc)
             return (NOW.year - dt.year) * 12 + (NOW.month - dt.month)
@@ -66,7 +111,7 @@ def parse_money_range_usd(s: str):
     if "UNKNOWN" in x or x in {"-", "N/A", "NA"}:
         return (None, None)
     def num(tok):
-        m = re.search(r"(\d+(\.\d+)?)\s*([KMB])?", tok)
+        m = _RX_NUM.search(tok)
         if not m:
             try: return float(tok)
             except: return None
@@ -75,14 +120,14 @@ def parse_money_range_usd(s: str):
         elif suf == "M": v*=1e6
         elif suf == "B": v*=1e9
         return v
-    m = re.match(r"^\$?([\d\.]+)\s*([KMB])\s*[-–]\s*\$?([\d\.]+)\s*([KMB])$", x)
+    m = _RX_RANGE.match(x)
     if m:
         a = num(m.group(1)+m.group(2)); b = num(m.group(3)+m.group(4))
         return (a,b)
-    m = re.match(r"^\$?([\d\.]+)\s*([KMB])\+?$", x)
+    m = _RX_SINGLE.match(x)
     if m:
         v = num(m.group(1)+m.group(2)); return (v, None)
-    anynum = re.findall(r"([\d\.]+)\s*([KMB])", x)
+    anynum = _RX_ANY.findall(x)
     if anynum:
         vals = [num(n+u) for n,u in anynum if num(n+u) is not None]
         if vals: return (min(vals), max(vals))
@@ -93,48 +138,116 @@ def parse_emp_range(s: str):
     if not isinstance(s, str): s = str(s)
     x = s.replace(",", "").lower().strip().replace(" to ", "-")
     if x.endswith("+"):
-        try: base = int(re.sub(r"\D","", x)); return (base, None)
+        try: base = int(_RX_EMP_DIGITS.sub("", x)); return (base, None)
         except: return (None, None)
-    m = re.match(r"^\s*(\d+)\s*-\s*(\d+)\s*$", x)
+    m = _RX_EMP_RANGE.match(x)
     if m: return (int(m.group(1)), int(m.group(2)))
     try:
-        v = int(re.sub(r"\D","", x)); return (v, v)
+        v = int(_RX_EMP_DIGITS.sub("", x)); return (v, v)
     except: return (None, None)
 
 def yn(v):
     if isinstance(v,str):
         t=v.strip().lower()
-        if t in {"yes","y","true","t","1","actively hiring","hiring"}: return True
+        if t in YES: return True
         if t in {"no","n","false","f","0"}: return False
     if isinstance(v,(int,float)): return bool(v)
     return False
 
 # ---- HTTP helpers ----
-def fetch(url, timeout=12):
+# Politesse par hôte: {netloc: [verrou, dernier accès]}; les domaines différents ne s'attendent pas
+HOST_LOCKS = {}
+_HOST_LOCKS_GUARD = threading.Lock()
+
+def throttle(url, delay):
+    if not delay or delay <= 0: return
+    host = urlparse(url).netloc
+    with _HOST_LOCKS_GUARD:
+        slot = HOST_LOCKS.setdefault(host, [threading.Lock(), 0.0])
+    with slot[0]:
+        wait = slot[1] + delay - time.monotonic()
+        if wait > 0: time.sleep(wait)
+        slot[1] = time.monotonic()
+
+def is_cached(url):
+    # Réponse fraîche dans le cache disque: pas de requête réseau, donc pas de délai de politesse.
+    # Lit seulement la colonne "expires" de l'index SQLite, sans désérialiser la réponse stockée.
+    cache = getattr(SESSION, "cache", None)
+    if cache is None: return False
     try:
-        r = requests.get(url, headers=HDR, timeout=timeout, allow_redirects=True)
-        if r.status_code==200: return r.text
+        key = cache.create_key(SESSION.prepare_request(requests.Request("GET", url)))
+        responses = cache.responses
+        with responses.connection() as con:
+            row = con.execute(f"SELECT expires FROM {responses.table_name} WHERE key = ?", (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+    except Exception:
+        return False
+
+# Les pages ne servent qu'à quelques regex et aux liens <a>: seuls MAX_BODY octets sont décodés et scannés.
+# Sans cache, le téléchargement s'arrête aussi à MAX_BODY. Avec le cache disque (requests-cache),
+# la page entière est téléchargée et stockée avant lecture: le plafond ne borne alors que le parsing.
+MAX_BODY = 512 * 1024
+
+# 502/503/504 relancés ici plutôt que dans urllib3: chaque tentative repasse par throttle(),
+# et Retry-After est ignoré (un "Retry-After: 3600" bloquerait un worker pendant une heure)
+RETRY_STATUS = {502, 503, 504}
+RETRIES = 2
+
+def http_get(url, delay=0.0, **kwargs):
+    for attempt in range(RETRIES + 1):
+        if attempt: time.sleep(0.3 * 2 ** (attempt - 1))
+        if delay > 0 and (attempt or not is_cached(url)): throttle(url, delay)
+        r = SESSION.get(url, **kwargs)
+        if r.status_code not in RETRY_STATUS or attempt == RETRIES: return r
+        r.close()
+
+def fetch(url, timeout=12, delay=0.0):
+    try:
+        with http_get(url, delay=delay, timeout=timeout, allow_redirects=True, stream=True) as r:
+            if r.status_code!=200: return None
+            body = bytearray()
+            for chunk in r.iter_content(64 * 1024):
+                body += chunk
+                if len(body) >= MAX_BODY: break
+            body = bytes(body[:MAX_BODY])
+            try:
+                return body.decode(r.encoding or "utf-8", errors="replace")
+            except LookupError:  # charset déclaré inconnu de Python (ex. utf8mb4)
+                return body.decode("utf-8", errors="replace")
     except Exception:
         return None
-    return None
 
-def allowed(url):
+@functools.lru_cache(maxsize=4096)
+def _allowed_cached(scheme, netloc):
     try:
-        p=urlparse(url)
-        rb=f"{p.scheme}://{p.netloc}/robots.txt"
-        r=requests.get(rb, headers=HDR, timeout=8)
+        rb=f"{scheme}://{netloc}/robots.txt"
+        r=http_get(rb, timeout=8)
         if r.status_code!=200: return True
         if re.search(r"(?im)^disallow\s*:\s*/\s*$", r.text): return False
         return True
     except Exception:
         return True
 
+def allowed(url):
+    try:
+        p=urlparse(url)
+        return _allowed_cached(p.scheme, p.netloc)
+    except Exception:
+        return True
+
 # ---- Enrichment detectors ----
 def find_career_links(home_html, base):
     links=[]
-    soup=BeautifulSoup(home_html, "html.parser")
-    for a in soup.find_all("a", href=True):
-        href=a.get("href"); ll=str(href).lower()
+    try:
+        try:
+            doc=lxml.html.fromstring(home_html)
+        except ValueError:  # str avec déclaration <?xml encoding=...?>
+            doc=lxml.html.fromstring(home_html.encode("utf-8"))
+        hrefs=doc.xpath("//a/@href")
+    except Exception:
+        hrefs=[]
+    for href in hrefs:
+        ll=str(href).lower()
         if any(k in ll for k in CAREERS_HINTS):
             links.append(urljoin(base, href))
     for fb in CAREERS_FALLBACK:
@@ -144,66 +257,55 @@ def find_career_links(home_html, base):
         if u not in seen: seen.add(u); out.append(u)
     return out
 
-def scan_jobs_for_fpna(domain, delay=1.0):
-    try:
-        parsed = urlparse(domain if str(domain).startswith("http") else "https://" + str(domain))
-        base = f"{parsed.scheme}://{parsed.netloc}"
-        if not allowed(base): return (False,"")
-        home = fetch(base)
-        if not home: return (False,"")
-        if RX_FPNA.search(home):
-            return (True, f"{base} (homepage)")
-        links = find_career_links(home, base)
-        for u in links[:6]:
-            time.sleep(delay)
-            html = fetch(u)
-            if not html: continue
-            if RX_FPNA.search(html):
-                return (True, u)
-        return (False,"")
-    except Exception:
-        return (False,"")
+# Un .search() par bucket demandé: plus rapide qu'une alternance à groupes nommés avec re
+def scan_page(html, need):
+    return {k for k in need if RX_BUCKETS[k].search(html)}
 
-def detect_stack_via_jobs(domain, delay=1.0):
+# Homepage puis pages carrières, chacune récupérée une seule fois, jusqu'à avoir FP&A (jobs) et SF/LK (stack)
+def enrich_site(base, delay=1.0):
     try:
-        parsed = urlparse(domain if str(domain).startswith("http") else "https://" + str(domain))
-        base = f"{parsed.scheme}://{parsed.netloc}"
-        if not allowed(base): return (False,"",False,"")
-        home = fetch(base)
-        if not home: return (False,"",False,"")
-        links = find_career_links(home, base)
-        for u in links[:6]:
-            time.sleep(delay)
-            html = fetch(u)
+        if not allowed(base): return (False,"",False,False,"")
+        home = fetch(base, delay=delay)
+        if not home: return (False,"",False,False,"")
+        fpna_ok, fpna_ev = False, ""
+        sf_ok, lk_ok, stack_ev = False, False, ""
+        need = {"fpna", "stack"}
+        # Homepage: FP&A seulement (la stack ne se lit que sur les pages carrières)
+        if RX_FPNA.search(home):
+            fpna_ok, fpna_ev = True, f"{base} (homepage)"
+            need.discard("fpna")
+        for u in find_career_links(home, base)[:6]:
+            if not need: break
+            html = fetch(u, delay=delay)
             if not html: continue
-            sf = bool(RX_SF.search(html))
-            lk = bool(RX_LK.search(html))
-            if sf or lk:
-                return (sf, u if sf else "", lk, u if lk else "")
-        return (False,"",False,"")
+            hits = scan_page(html, ({"fpna"} & need) | ({"sf","lk"} if "stack" in need else set()))
+            if "fpna" in need and "fpna" in hits:
+                fpna_ok, fpna_ev = True, u
+                need.discard("fpna")
+            if "stack" in need and hits & {"sf","lk"}:
+                sf_ok, lk_ok, stack_ev = "sf" in hits, "lk" in hits, u
+                need.discard("stack")
+        return (fpna_ok, fpna_ev, sf_ok, lk_ok, stack_ev)
     except Exception:
-        return (False,"",False,"")
+        return (False,"",False,False,"")
 
-def detect_stackshare(domain):
+def detect_stackshare(host, delay=1.0):
     try:
-        parsed = urlparse(domain if domain.startswith("http") else "https://" + domain)
-        slug = (parsed.hostname or domain).split(".")[0]
+        slug = host.split(".")[0]
         url = f"https://stackshare.io/{slug}"
         if not allowed(url): return (False,"",False,"")
-        html = fetch(url)
+        html = fetch(url, delay=delay)
         if not html: return (False,"",False,"")
         sf = bool(RX_SF.search(html)); lk = bool(RX_LK.search(html))
         return (sf, "stackshare", lk, "stackshare")
     except Exception:
         return (False,"",False,"")
 
-def detect_builtwith(domain):
+def detect_builtwith(host, delay=1.0):
     try:
-        parsed = urlparse(domain if domain.startswith("http") else "https://" + domain)
-        host = parsed.hostname or domain
         url = f"https://builtwith.com/{host}"
         if not allowed(url): return (False,"",False,"")
-        html = fetch(url)
+        html = fetch(url, delay=delay)
         if not html: return (False,"",False,"")
         sf = bool(RX_SF.search(html)); lk = bool(RX_LK.search(html))
         return (sf, "builtwith", lk, "builtwith")
@@ -216,10 +318,10 @@ def serpapi_fpna_count(company_name, serpapi_key):
     try:
         q = f'site:linkedin.com/in ("FP&A" OR FPnA) "{company_name}"'
         url = f"https://serpapi.com/search.json?engine=google&q={quote_plus(q)}&api_key={serpapi_key}"
-        r = requests.get(url, headers=HDR, timeout=15)
+        r = http_get(url, timeout=15)
         if r.status_code != 200:
             return (None, "")
-        data = r.json()
+        data = orjson.loads(r.content) if orjson is not None else r.json()
         total = data.get("search_information", {}).get("total_results", None)
         ev = f"SerpAPI: {q}"
         if isinstance(total, (int, float)): return (int(total), ev)
@@ -229,65 +331,75 @@ def serpapi_fpna_count(company_name, serpapi_key):
         return (None, "")
 
 # ---- Scoring (critères identiques, source différente BASE vs ENRICH) ----
-def compute_flags_local(row):
-    name = (row.get("Organization Name") or "").strip()
-    website = row.get("Website") or row.get("Organization Name URL") or ""
-    ipo_status = str(row.get("IPO Status") or "").strip().lower()
-    last_funding_type = str(row.get("Last Funding Type") or "").strip().lower()
-    last_funding_date = row.get("Last Funding Date")
-    hiring = yn(row.get("Actively Hiring"))
-    depts = row.get("Contact Job Departments") or ""
-    desc = row.get("Description") or ""
-    emp_min, emp_max = parse_emp_range(row.get("Number of Employees"))
-    rev_min, rev_max = parse_money_range_usd(row.get("Estimated Revenue Range"))
+def _col(df, name):
+    return df[name] if name in df.columns else pd.Series("", index=df.index)
+
+def _map_range(col, fn):
+    # Peu de valeurs distinctes (tranches) -> un appel du parseur par valeur, pas par ligne
+    lookup = {v: fn(v) for v in col.unique()}
+    lo = col.map({v: r[0] for v, r in lookup.items()})
+    hi = col.map({v: r[1] for v, r in lookup.items()})
+    return pd.to_numeric(lo, errors="coerce"), pd.to_numeric(hi, errors="coerce")
+
+def months_since_col(col):
+    # Mêmes formats (et même ordre) que months_since, mais parsés colonne par colonne
+    s = col.astype(str).str.strip()
+    # Unité seconde: les dates hors bornes nanoseconde (0202-05-01, 2300-01-01) restent parsables
+    dt = pd.Series(pd.NaT, index=col.index, dtype="datetime64[s, UTC]")
+    for f in DATE_FMTS:
+        todo = dt.isna() & (s != "")
+        if not todo.any(): break
+        dt[todo] = pd.to_datetime(s[todo], format=f, errors="coerce", utc=True)
+    return (NOW.year - dt.dt.year) * 12 + (NOW.month - dt.dt.month)
+
+# Flags BASE de toutes les lignes en une passe vectorisée (mêmes règles que compute_flags_enriched)
+def compute_flags_local(df):
+    ipo_status = _col(df, "IPO Status").astype(str).str.strip().str.lower()
+    last_funding_type = _col(df, "Last Funding Type").astype(str).str.strip().str.lower()
+    hiring = _col(df, "Actively Hiring").astype(str).str.strip().str.lower().isin(YES)
+    depts_desc = _col(df, "Contact Job Departments") + "\n" + _col(df, "Description")
+    emp_min, emp_max = _map_range(_col(df, "Number of Employees"), parse_emp_range)
+    rev_min, rev_max = _map_range(_col(df, "Estimated Revenue Range"), parse_money_range_usd)
 
     # Taille
-    size_ok = False
-    if emp_min is not None and emp_max is not None:
-        size_ok = (emp_min <= 2000 and emp_max >= 200)
-    elif emp_min is not None:
-        size_ok = (200 <= emp_min <= 2000)
+    size_ok = ((emp_min <= 2000) & (emp_max >= 200)).where(emp_max.notna(), emp_min.between(200, 2000))
 
     # Croissance
-    m = months_since(last_funding_date)
-    recent_raise = (m is not None and m <= 12)
-    series_ok = (ipo_status not in {"public"} and last_funding_type in SERIES_GROWTH)
-    growth_ok = bool(hiring or recent_raise or series_ok)
+    m = months_since_col(_col(df, "Last Funding Date"))
+    recent_raise = m <= 12
+    series_ok = ~ipo_status.isin({"public"}) & last_funding_type.isin(SERIES_GROWTH)
+    growth_ok = hiring | recent_raise | series_ok
 
     # FP&A headcount (proxy local)
-    mentions = len(RX_FPNA.findall(f"{depts}\n{desc}"))
-    fpna_count_est = min(20, mentions * 2)
-    fpna_ok = fpna_count_est > 5
+    mentions = depts_desc.str.count(RX_FPNA.pattern, flags=re.IGNORECASE)
+    fpna_ok = (mentions * 2).clip(upper=20) > 5
 
     # Jobs FP&A (proxy local)
-    jobs_ok = bool(hiring and RX_FPNA.search(f"{depts}\n{desc}"))
+    jobs_ok = hiring & depts_desc.str.contains(RX_FPNA.pattern, flags=re.IGNORECASE)
 
     # Stack (proxy local)
-    stack_ok = bool(RX_SF.search(f"{depts}\n{desc}") or RX_LK.search(f"{depts}\n{desc}"))
+    stack_ok = (depts_desc.str.contains(RX_SF.pattern, flags=re.IGNORECASE)
+                | depts_desc.str.contains(RX_LK.pattern, flags=re.IGNORECASE))
 
     # Mid-market revenu
-    if rev_min is not None or rev_max is not None:
-        lo, hi = 50e6, 1e9
-        rlo = rev_min if rev_min is not None else 0
-        rhi = rev_max if rev_max is not None else 9e18
-        mid_ok = (rlo <= hi and rhi >= lo)
-    else:
-        mid_ok = size_ok
-
-    score = sum([size_ok, growth_ok, fpna_ok, jobs_ok, stack_ok, mid_ok])
-    return {
-        "size_ok": bool(size_ok),
-        "growth_ok": bool(growth_ok),
-        "fpna_ok": bool(fpna_ok),
-        "jobs_ok": bool(jobs_ok),
-        "stack_ok": bool(stack_ok),
-        "mid_ok": bool(mid_ok),
-        "score": int(score),
-        "months_since_raise": m if m is not None else 9999
-    }
-
-def compute_flags_enriched(row, delay=1.0, serpapi_key=None):
-    name = (row.get("Organization Name") or "").strip()
+    lo, hi = 50e6, 1e9
+    rev_known = rev_min.notna() | rev_max.notna()
+    mid_ok = ((rev_min.fillna(0) <= hi) & (rev_max.fillna(9e18) >= lo)).where(rev_known, size_ok)
+
+    flags = pd.DataFrame({
+        "size_ok": size_ok.astype(bool),
+        "growth_ok": growth_ok.astype(bool),
+        "fpna_ok": fpna_ok.astype(bool),
+        "jobs_ok": jobs_ok.astype(bool),
+        "stack_ok": stack_ok.astype(bool),
+        "mid_ok": mid_ok.astype(bool),
+    })
+    flags["score"] = flags.sum(axis=1).astype(int)
+    flags["months_since_raise"] = m.fillna(9999).astype(int)
+    return flags
+
+# serp: Future de serpapi_fpna_count lancé en lot par main(), ou None sans clé SerpAPI
+def compute_flags_enriched(row, delay=1.0, serp=None):
     website = row.get("Website") or row.get("Organization Name URL") or ""
     ipo_status = str(row.get("IPO Status") or "").strip().lower()
     last_funding_type = str(row.get("Last Funding Type") or "").strip().lower()
@@ -311,30 +423,31 @@ def compute_flags_enriched(row, delay=1.0, serpapi_key=None):
     series_ok = (ipo_status not in {"public"} and last_funding_type in SERIES_GROWTH)
     growth_ok = bool(hiring or recent_raise or series_ok)
 
-    # FP&A headcount (SerpAPI sinon proxy)
-    fpna_count, fpna_ev = serpapi_fpna_count(name, serpapi_key) if serpapi_key else (None, "")
-    if fpna_count is None:
-        mentions = len(RX_FPNA.findall(f"{depts}\n{desc}"))
-        fpna_count = min(20, mentions * 2)
-    fpna_ok = (fpna_count is not None and fpna_count > 5)
-
-    # Jobs FP&A (scrape pages)
-    jobs_ok, _ = (False, "")
-    if website:
-        jobs_ok, _ = scan_jobs_for_fpna(website, delay=delay)
-
-    # Stack (jobs + stackshare + builtwith + local texte)
-    stack_ok = False
-    if website:
-        a,b,c,d = detect_stack_via_jobs(website, delay=delay)
-        stack_ok = bool(a or c)
+    # Jobs FP&A + Stack (site: homepage + pages carrières, puis stackshare + builtwith + local texte)
+    # URL du site parsée une seule fois pour tous les détecteurs
+    jobs_ok, stack_ok = False, False
+    try:
+        parsed = urlparse(website if website.startswith("http") else "https://" + website) if website else None
+    except ValueError:
+        parsed = None
+    if parsed:
+        base, host = f"{parsed.scheme}://{parsed.netloc}", parsed.hostname or website
+        jobs_ok, _, sf, lk, _ = enrich_site(base, delay=delay)
+        stack_ok = bool(sf or lk)
         if not stack_ok:
-            a,b,c,d = detect_stackshare(website); stack_ok = bool(a or c)
+            a,b,c,d = detect_stackshare(host, delay=delay); stack_ok = bool(a or c)
         if not stack_ok:
-            a,b,c,d = detect_builtwith(website); stack_ok = bool(a or c)
+            a,b,c,d = detect_builtwith(host, delay=delay); stack_ok = bool(a or c)
     if not stack_ok:
         stack_ok = bool(RX_SF.search(f"{depts}\n{desc}") or RX_LK.search(f"{depts}\n{desc}"))
 
+    # FP&A headcount (SerpAPI sinon proxy)
+    fpna_count, fpna_ev = serp.result() if serp else (None, "")
+    if fpna_count is None:
+        mentions = sum(1 for _ in RX_FPNA.finditer(depts)) + sum(1 for _ in RX_FPNA.finditer(desc))
+        fpna_count = min(20, mentions * 2)
+    fpna_ok = (fpna_count is not None and fpna_count > 5)
+
     # Mid-market
     if rev_min is not None or rev_max is not None:
         lo, hi = 50e6, 1e9
@@ -363,8 +476,10 @@ def main():
     ap.add_argument("--outdir", default="./out", help="output directory")
     ap.add_argument("--topn", type=int, default=240, help="N à enrichir (défaut 240)")
     ap.add_argument("--delay", type=float, default=1.0, help="délai entre requêtes web")
+    ap.add_argument("--workers", type=int, default=20, help="threads d'enrichissement en parallèle")
     ap.add_argument("--log-every", type=int, default=1, help="log toutes les N lignes")
     ap.add_argument("--quiet", action="store_true", help="logs réduits")
+    ap.add_argument("--no-http-cache", action="store_true", help="désactive le cache disque des pages (outdir/.http_cache)")
     ap.add_argument("--serpapi-key", default=os.getenv("SERPAPI_KEY",""), help="clé SerpAPI pour FP&A headcount")
     args = ap.parse_args()
 
@@ -375,54 +490,56 @@ def main():
     )
 
     outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
+    global SESSION
+    if not args.no_http_cache:
+        if requests_cache is None:
+            LOGGER.info("requests-cache absent: pas de cache HTTP disque")
+        else:
+            SESSION = build_session(outdir / ".http_cache")
     LOGGER.info(f"Chargement {args.input}")
     df = pd.read_csv(args.input, dtype=str).fillna("")
     total = len(df)
     LOGGER.info(f"Lignes: {total} | TopN enrichis: {args.topn} | SerpAPI: {'YES' if args.serpapi_key else 'NO'}")
 
-    # Pass 1: score BASE local
-    base_rows=[]
-    for i, row in df.iterrows():
-        if args.log_every and (i % args.log_every == 0):
-            LOGGER.info(f"[BASE {i+1}/{total}] {row.get('Organization Name','')}")
-        flags = compute_flags_local(row)
-        r = dict(row)
-        r["Score_BASE"] = flags["score"]
-        r["BASE_MonthsSinceRaise"] = flags["months_since_raise"]
-        base_rows.append(r)
-    base_df = pd.DataFrame(base_rows)
+    # Pass 1: score BASE local (vectorisé sur tout le CSV)
+    local = compute_flags_local(df)
+    base_df = pd.DataFrame(index=df.index)
+    base_df["Score_BASE"] = local["score"]
+    base_df["BASE_MonthsSinceRaise"] = local["months_since_raise"]
+    LOGGER.info(f"[BASE] {total} lignes scorées")
 
     # Choix du TOP N par Score_BASE, tie-break par recent funding (moins de mois = mieux)
-    base_df["_tie"] = base_df["BASE_MonthsSinceRaise"].astype(int)
-    base_sorted = base_df.sort_values(by=["Score_BASE","_tie"], ascending=[False, True])
-    enrich_index = set(base_sorted.head(args.topn).index.tolist())
+    # nlargest (tas, O(N log k)) plutôt qu'un tri complet; tie de signe inversé pour rester en ordre décroissant
+    base_df["_neg_tie"] = -base_df["BASE_MonthsSinceRaise"].astype(int)
+    enrich_index = set(base_df.nlargest(args.topn, ["Score_BASE","_neg_tie"]).index.tolist())
     LOGGER.info(f"Sélectionné {len(enrich_index)} lignes pour enrichissement.")
 
-    # Pass 2: score FINAL, enrich uniquement topN
-    final_rows=[]
-    for i, row in df.iterrows():
-        if args.log_every and (i % args.log_every == 0):
-            LOGGER.info(f"[FINAL {i+1}/{total}] {row.get('Organization Name','')} | {'ENRICH' if i in enrich_index else 'LOCAL'}")
-        if i in enrich_index:
-            flags = compute_flags_enriched(row, delay=args.delay, serpapi_key=(args.serpapi_key or None))
-        else:
-            flags = compute_flags_local(row)
-        r = dict(row)
-        r["Score"] = flags["score"]
-        r["Size_OK"] = flags["size_ok"]
-        r["Growth_OK"] = flags["growth_ok"]
-        r["FPnA_OK"] = flags["fpna_ok"]
-        r["Jobs_OK"] = flags["jobs_ok"]
-        r["Stack_OK"] = flags["stack_ok"]
-        r["Mid_OK"] = flags["mid_ok"]
-        r["MonthsSinceRaise"] = flags["months_since_raise"]
-        r["Enriched"] = (i in enrich_index)
-        final_rows.append(r)
-
-        if i in enrich_index:
-            time.sleep(args.delay)
-
-    out = pd.DataFrame(final_rows)
+    # Pass 2a: enrichissement du topN en parallèle (I/O-bound, indépendant par ligne)
+    enriched = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as serp_pool, \
+         ThreadPoolExecutor(max_workers=args.workers) as pool:
+        # Toutes les requêtes SerpAPI partent d'abord, en lot sur la session partagée,
+        # et tournent pendant le scraping des sites; chaque ligne récupère son résultat à la fin
+        serp = {}
+        if args.serpapi_key:
+            serp = {i: serp_pool.submit(serpapi_fpna_count, (df.loc[i].get("Organization Name") or "").strip(), args.serpapi_key)
+                    for i in enrich_index}
+        futures = {pool.submit(compute_flags_enriched, df.loc[i], args.delay, serp.get(i)): i for i in enrich_index}
+        for n, fut in enumerate(as_completed(futures), 1):
+            i = futures[fut]
+            enriched[i] = fut.result()
+            if args.log_every and (n % args.log_every == 0):
+                LOGGER.info(f"[ENRICH {n}/{len(futures)}] {df.loc[i].get('Organization Name','')}")
+
+    # Pass 2b: score FINAL = flags locaux, remplacés par les flags enrichis sur le topN
+    out = df.copy()
+    pos = out.index.get_indexer(list(enriched))
+    for col, key in FINAL_COLS:
+        arr = local[key].to_numpy(copy=True)
+        arr[pos] = [flags[key] for flags in enriched.values()]
+        out[col] = arr
+    out["Enriched"] = out.index.isin(list(enrich_index))
+    LOGGER.info(f"[FINAL] {total} lignes ({len(enriched)} enrichies)")
 
     # Tri final: Score desc, funding le plus récent
     out = out.sort_values(by=["Score","MonthsSinceRaise"], ascending=[False, True])